@@ -0,0 +1,172 @@
+"""
+Precomputed per-event-type availability for instant day-level answers.
+
+Slot lists from Cal.com are folded into one 96-bit mask per day (one bit per
+15-minute bucket in the clinic timezone) plus an exact slot count per day, so
+"which days next week are free?" and "Tuesday mornings?" never touch Cal.com.
+"""
+import asyncio
+import logging
+import threading
+import time
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import requests
+
+from config import CLINIC_TIMEZONE, AVAILABILITY_DAYS_AHEAD
+from utils import get_clinic_timezone
+
+logger = logging.getLogger(__name__)
+
+BUCKET_MINUTES = 15
+BUCKETS_PER_DAY = 24 * 60 // BUCKET_MINUTES
+
+# Named time windows in clinic local time, as (start, end) "HH:MM"
+TIME_WINDOWS = {
+    "morning": ("06:00", "12:00"),
+    "afternoon": ("12:00", "17:00"),
+    "evening": ("17:00", "22:00"),
+}
+
+
+def window_mask(start_time: str, end_time: str) -> int:
+    """Return the bucket mask covering [start_time, end_time) given as "HH:MM"."""
+    def to_bucket(hhmm: str) -> int:
+        hours, minutes = hhmm.split(":")
+        return (int(hours) * 60 + int(minutes)) // BUCKET_MINUTES
+
+    first, last = to_bucket(start_time), min(to_bucket(end_time), BUCKETS_PER_DAY)
+    if not 0 <= first < last:
+        raise ValueError(f"Invalid time window {start_time}-{end_time}")
+    return ((1 << (last - first)) - 1) << first
+
+
+class EventAvailability:
+    """Availability of one event type over a contiguous range of days."""
+
+    def __init__(self, start: date, masks: List[int], counts: array, built_at: float):
+        self.start = start
+        self.masks = masks      # one BUCKETS_PER_DAY-bit int per day
+        self.counts = counts    # exact number of slot starts per day
+        self.built_at = built_at
+
+    @property
+    def end(self) -> date:
+        return self.start + timedelta(days=len(self.masks) - 1)
+
+    def covers(self, start: date, end: date) -> bool:
+        return self.start <= start and end <= self.end
+
+    def day_counts(self, start: date, end: date, mask: Optional[int] = None) -> List[Tuple[date, int]]:
+        """
+        Return (day, openings) for each day in [start, end] within this range.
+
+        Without a mask openings is the exact slot count; with a window mask it
+        is the number of 15-minute buckets in the window that have a slot.
+        """
+        first = max((start - self.start).days, 0)
+        last = min((end - self.start).days, len(self.masks) - 1)
+        result = []
+        for offset in range(first, last + 1):
+            if mask is None:
+                openings = self.counts[offset]
+            else:
+                openings = (self.masks[offset] & mask).bit_count()
+            result.append((self.start + timedelta(days=offset), openings))
+        return result
+
+
+def build_availability(slots: Dict[str, Any], start: date, end: date) -> EventAvailability:
+    """Fold a Cal.com slots payload (date -> list of slots) into an EventAvailability."""
+    clinic_tz = get_clinic_timezone()
+    days = (end - start).days + 1
+    masks = [0] * days
+    counts = array("H", [0] * days)
+
+    for day_slots in slots.values():
+        for slot in day_slots:
+            raw = slot.get("start") if isinstance(slot, dict) else slot
+            if not raw:
+                continue
+            local = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+            if local.tzinfo is not None:
+                local = local.astimezone(clinic_tz)
+            offset = (local.date() - start).days
+            if not 0 <= offset < days:
+                continue
+            masks[offset] |= 1 << ((local.hour * 60 + local.minute) // BUCKET_MINUTES)
+            counts[offset] += 1
+
+    return EventAvailability(start, masks, counts, time.time())
+
+
+class AvailabilityIndex:
+    """Per-event-type availability, built from Cal.com slot queries and refreshed in the background."""
+
+    def __init__(self, client, days_ahead: int = AVAILABILITY_DAYS_AHEAD):
+        self.client = client
+        self.days_ahead = days_ahead
+        self._entries: Dict[int, EventAvailability] = {}
+        self._lock = threading.Lock()
+
+    def get(self, event_type_id: int) -> Optional[EventAvailability]:
+        return self._entries.get(event_type_id)
+
+    def default_range(self) -> Tuple[date, date]:
+        """The window kept in the index: today through days_ahead - 1 days later."""
+        today = datetime.now(get_clinic_timezone()).date()
+        return today, today + timedelta(days=self.days_ahead - 1)
+
+    def refresh(self, event_type_id: int) -> EventAvailability:
+        """Fetch the default window from Cal.com and store it as the event type's entry."""
+        entry = self.fetch(event_type_id, *self.default_range())
+        with self._lock:
+            self._entries[event_type_id] = entry
+        return entry
+
+    def fetch(self, event_type_id: int, start: date, end: date) -> EventAvailability:
+        """Build availability for [start, end] from Cal.com without storing it."""
+        data = self.client.get_available_slots(
+            event_type_id=event_type_id,
+            start_date=start.isoformat(),
+            end_date=end.isoformat(),
+            time_zone=CLINIC_TIMEZONE,
+            format="time"
+        )
+        if data.get("status") != "success":
+            raise ValueError("Slots API returned non-success status")
+
+        return build_availability(data.get("data", {}), start, end)
+
+    def update_from_slots(self, event_type_id: int, slots: Dict[str, Any], start: date, end: date) -> None:
+        """Overwrite already-indexed days with a fresher slots payload for [start, end]."""
+        with self._lock:
+            entry = self._entries.get(event_type_id)
+            if entry is None:
+                return
+            start, end = max(start, entry.start), min(end, entry.end)
+            if start > end:
+                return
+            fresh = build_availability(slots, start, end)
+            masks = list(entry.masks)
+            counts = array("H", entry.counts)
+            offset = (start - entry.start).days
+            masks[offset:offset + len(fresh.masks)] = fresh.masks
+            counts[offset:offset + len(fresh.counts)] = fresh.counts
+            # Swap in a new object so concurrent readers never see a half-updated entry
+            self._entries[event_type_id] = EventAvailability(entry.start, masks, counts, entry.built_at)
+
+    async def refresh_forever(self, event_type_ids: List[int], interval: float) -> None:
+        """Keep the given event types fresh until cancelled."""
+        while True:
+            for event_type_id in event_type_ids:
+                try:
+                    await asyncio.to_thread(self.refresh, event_type_id)
+                except (requests.RequestException, ValueError) as e:
+                    logger.warning(f"Availability refresh failed for event type {event_type_id}: {str(e)}")
+                except Exception:
+                    # An unexpected payload must not end the refresher for every event type
+                    logger.exception(f"Availability refresh failed for event type {event_type_id}")
+            await asyncio.sleep(interval)
@@ -1,9 +1,67 @@
 """
 Cal.com API client for handling all API interactions.
 """
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+
 import requests
-from typing import Dict, Any, Optional, List
-from config import BASE_URL, get_headers, CLINIC_TIMEZONE
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+from config import (
+    BASE_URL,
+    get_headers,
+    CLINIC_TIMEZONE,
+    HTTP_POOL_SIZE,
+    BOOKINGS_PAGE_SIZE,
+    HEDGE_AFTER_MS,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_POOL_SIZE,
+    SLOTS_CACHE_SIZE,
+)
+from tracing import span
+
+
+class TracedSession(requests.Session):
+    """requests.Session that records a span for every HTTP call."""
+    
+    def request(self, method, url, *args, **kwargs):
+        with span("calcom.http", **{"http.method": method, "http.url": url}) as current:
+            response = super().request(method, url, *args, **kwargs)
+            if current is not None:
+                current.set_attribute("http.status_code", response.status_code)
+            return response
+
+
+class DeadlineExceeded(requests.Timeout):
+    """Raised when Cal.com does not answer within the caller's deadline."""
+    
+    def __init__(self, message: str, cached: Optional[Tuple[Dict[str, Any], float]] = None):
+        super().__init__(message)
+        # (response, fetched_at epoch seconds) of the last good answer for the same query, if any
+        self.cached = cached
+
+
+class LatencyTracker:
+    """Rolling window of recent upstream latencies, used to pick the hedge delay."""
+    
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, pct: float) -> Optional[float]:
+        """Return the pct-th percentile in seconds, or None until enough samples exist."""
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
 
 
 class CalComClient:
@@ -13,6 +71,83 @@ class CalComClient:
         self.base_url = BASE_URL
         self.slots_headers = get_headers(isSlots=True)
         self.default_headers = get_headers(isSlots=False)
+        # Shared session keeps TLS connections to Cal.com alive between calls
+        self.session = TracedSession()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE))
+        self._hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE)
+        self.slots_latency = LatencyTracker()
+        self._slots_cache: "OrderedDict[tuple, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._slots_cache_lock = threading.Lock()
+    
+    def warm_up(self) -> None:
+        """Open a pooled connection to Cal.com."""
+        # Any response will do - we only want the TCP/TLS handshake out of the way
+        self.session.head(self.base_url, headers=self.default_headers, timeout=5)
+    
+    def _get_with_deadline(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        params: Dict[str, Any],
+        deadline: float,
+        hedge: bool = False
+    ) -> requests.Response:
+        """
+        GET url, giving up after deadline seconds.
+        
+        Without hedging the request runs in the calling thread. With hedge=True
+        the first attempt and, if it hasn't answered by the recent p95 latency, a
+        second identical one race on the dedicated hedge pool and the first
+        success wins. requests can't abort a call in flight, so a losing attempt
+        that already started is abandoned; its own timeout never outlives the
+        deadline. Attempts still queued when the call returns are cancelled.
+        """
+        expires_at = time.monotonic() + deadline
+        
+        def attempt() -> requests.Response:
+            started = time.monotonic()
+            remaining = expires_at - started
+            if remaining <= 0:
+                raise DeadlineExceeded(f"No answer from Cal.com within {deadline * 1000:.0f} ms")
+            response = self.session.get(url, headers=headers, params=params, timeout=remaining)
+            response.raise_for_status()
+            self.slots_latency.record(time.monotonic() - started)
+            return response
+        
+        if not hedge:
+            try:
+                return attempt()
+            except DeadlineExceeded:
+                raise
+            except requests.Timeout:
+                raise DeadlineExceeded(f"No answer from Cal.com within {deadline * 1000:.0f} ms")
+        
+        # copy_context() keeps worker-thread calls inside the caller's trace
+        pending = {self._hedge_executor.submit(contextvars.copy_context().run, attempt)}
+        try:
+            hedge_after = self.slots_latency.percentile(95) or HEDGE_AFTER_MS / 1000
+            done, pending = wait(pending, timeout=min(hedge_after, deadline), return_when=FIRST_COMPLETED)
+            if done:
+                return done.pop().result()
+            pending.add(self._hedge_executor.submit(contextvars.copy_context().run, attempt))
+            
+            last_error: Optional[BaseException] = None
+            while pending:
+                remaining = expires_at - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    last_error = future.exception()
+            
+            if last_error is not None and not pending and not isinstance(last_error, requests.Timeout):
+                raise last_error
+            raise DeadlineExceeded(f"No answer from Cal.com within {deadline * 1000:.0f} ms")
+        finally:
+            for future in pending:
+                future.cancel()
     
     def cancel_appointment(
         self, 
@@ -28,7 +163,7 @@ class CalComClient:
             endpoint = f"{self.base_url}/bookings/{booking_id_int}/cancel"
         
         body = {"cancellationReason": cancellation_reason}
-        response = requests.post(endpoint, headers=self.default_headers, json=body, timeout=12)
+        response = self.session.post(endpoint, headers=self.default_headers, json=body, timeout=12)
         response.raise_for_status()
         return response.json()
     
@@ -40,9 +175,16 @@ class CalComClient:
         time_zone: Optional[str] = None,
         username: Optional[str] = None,
         format: str = "time",
-        duration: Optional[int] = None
+        duration: Optional[int] = None,
+        deadline: float = 15,
+        hedge: bool = False
     ) -> Dict[str, Any]:
-        """Get available slots for an event type."""
+        """
+        Get available slots for an event type.
+        
+        Raises DeadlineExceeded (carrying the last good answer for the same query,
+        if one is cached) when Cal.com doesn't answer within deadline seconds.
+        """
         query_params = {
             "eventTypeId": event_type_id,
             "start": start_date,
@@ -55,10 +197,23 @@ class CalComClient:
         if duration:
             query_params["duration"] = duration
         
+        cache_key = tuple(sorted(query_params.items()))
         url = f"{self.base_url}/slots"
-        response = requests.get(url, headers=self.slots_headers, params=query_params, timeout=15)
-        response.raise_for_status()
-        return response.json()
+        try:
+            response = self._get_with_deadline(url, self.slots_headers, query_params, deadline, hedge)
+        except DeadlineExceeded as e:
+            with self._slots_cache_lock:
+                e.cached = self._slots_cache.get(cache_key)
+            raise
+        
+        data = response.json()
+        if data.get("status") == "success":
+            with self._slots_cache_lock:
+                self._slots_cache[cache_key] = (data, time.time())
+                self._slots_cache.move_to_end(cache_key)
+                if len(self._slots_cache) > SLOTS_CACHE_SIZE:
+                    self._slots_cache.popitem(last=False)
+        return data
     
     def get_upcoming_appointments(
         self,
@@ -76,7 +231,7 @@ class CalComClient:
         if after:
             query_params["afterStart"] = after
         
-        response = requests.get(
+        response = self.session.get(
             f"{self.base_url}/bookings", 
             headers=self.default_headers, 
             params=query_params, 
@@ -85,6 +240,77 @@ class CalComClient:
         response.raise_for_status()
         return response.json()
     
+    def _get_bookings_page(self, query_params: Dict[str, Any], skip: int) -> Dict[str, Any]:
+        """Fetch one page of /bookings starting at skip."""
+        response = self.session.get(
+            f"{self.base_url}/bookings",
+            headers=self.default_headers,
+            params={**query_params, "skip": skip},
+            timeout=12
+        )
+        response.raise_for_status()
+        data = response.json()
+        if data.get("status") != "success":
+            raise requests.RequestException("Bookings API returned non-success status")
+        return data
+    
+    def iter_bookings(
+        self,
+        status: Optional[str] = None,
+        attendee_email: Optional[str] = None,
+        after_start: Optional[str] = None,
+        before_end: Optional[str] = None,
+        team_id: Optional[int] = None,
+        page_size: int = BOOKINGS_PAGE_SIZE,
+        prefetch: bool = False
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield bookings matching the filters, following pagination to the end.
+        
+        With prefetch=True the next page is requested in the background while the
+        caller consumes the current one. At most two pages are held in memory.
+        """
+        query_params: Dict[str, Any] = {"take": page_size}
+        if status:
+            query_params["status"] = status
+        if attendee_email:
+            query_params["attendeeEmail"] = attendee_email.strip()
+        if after_start:
+            query_params["afterStart"] = after_start
+        if before_end:
+            query_params["beforeEnd"] = before_end
+        if team_id:
+            query_params["teamId"] = team_id
+        
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            skip = 0
+            data = self._get_bookings_page(query_params, skip)
+            while True:
+                bookings = data.get("data") or []
+                
+                # Prefer Cal.com's pagination block; fall back to a short page meaning "last page"
+                pagination = data.get("pagination")
+                has_next = pagination.get("hasNextPage") if pagination else len(bookings) == page_size
+                has_next = bool(has_next and bookings)
+                
+                next_page: Optional[Future] = None
+                if has_next:
+                    skip += len(bookings)
+                    if executor:
+                        next_page = executor.submit(
+                            contextvars.copy_context().run, self._get_bookings_page, query_params, skip
+                        )
+                
+                yield from bookings
+                
+                if not has_next:
+                    return
+                data = next_page.result() if next_page else self._get_bookings_page(query_params, skip)
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
     def create_booking(
         self,
         event_type_id: int,
@@ -105,7 +331,7 @@ class CalComClient:
         }
         # If you have custom fields for notes, add here (e.g., bookingFieldsResponses)
         
-        response = requests.post(
+        response = self.session.post(
             f"{self.base_url}/bookings", 
             headers=self.default_headers, 
             json=body, 
@@ -117,6 +343,6 @@ class CalComClient:
     def get_event_types(self, team_id: int) -> Dict[str, Any]:
         """Get event types for a specific team."""
         url = f"{self.base_url}/teams/{team_id}/event-types"
-        response = requests.get(url, headers=self.default_headers, timeout=10)
+        response = self.session.get(url, headers=self.default_headers, timeout=10)
         response.raise_for_status()
         return response.json()
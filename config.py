@@ -20,6 +20,40 @@ BOOKINGS_API_VERSION = "2024-08-13"
 BASE_URL = "https://api.cal.com/v2"
 CLINIC_TIMEZONE = "Asia/Qyzylorda"
 
+# Startup / connection pooling
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+# Bulk lookups
+BULK_LOOKUP_CONCURRENCY = int(os.getenv("BULK_LOOKUP_CONCURRENCY", "8"))
+BULK_LOOKUP_MAX_EMAILS = 1000
+BOOKINGS_PAGE_SIZE = 100
+
+# Slot queries: default deadline, optional hedged requests and stale-answer cache
+SLOTS_DEADLINE_MS = int(os.getenv("SLOTS_DEADLINE_MS", "15000"))
+SLOTS_HEDGING = os.getenv("SLOTS_HEDGING", "false").lower() in ("1", "true", "yes")
+# Hedge delay used until enough latency samples exist to compute a p95
+HEDGE_AFTER_MS = int(os.getenv("HEDGE_AFTER_MS", "1500"))
+HEDGE_MIN_SAMPLES = 20
+# Worker threads shared by hedged slot queries only
+HEDGE_POOL_SIZE = int(os.getenv("HEDGE_POOL_SIZE", "16"))
+SLOTS_CACHE_SIZE = 256
+
+# Availability summary index
+AVAILABILITY_DAYS_AHEAD = int(os.getenv("AVAILABILITY_DAYS_AHEAD", "14"))
+AVAILABILITY_REFRESH_SECONDS = int(os.getenv("AVAILABILITY_REFRESH_SECONDS", "300"))
+# Comma-separated event type IDs kept fresh in the background
+AVAILABILITY_EVENT_TYPE_IDS = [
+    int(event_type_id) for event_type_id in os.getenv("AVAILABILITY_EVENT_TYPE_IDS", "").split(",")
+    if event_type_id.strip()
+]
+
+
+# Request tracing
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+# OTLP/JSON lines file for sampled traces; unset disables export
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH")
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "3000"))
+
 
 def get_headers(isSlots: bool) -> Dict[str, str]:
     """Get headers for Cal.com API requests."""
@@ -3,20 +3,72 @@ Cal.com Integration API for Vapi
 
 This is the main application entry point that orchestrates all modules.
 """
-from fastapi import FastAPI
+import time
+
+# Measured from the first line of the process so cold starts can be tracked
+PROCESS_START = time.perf_counter()
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+import requests
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-from routes import router
+from config import AVAILABILITY_EVENT_TYPE_IDS, AVAILABILITY_REFRESH_SECONDS
+from routes import router, client, availability_index
+from utils import load_knowledge_base, get_clinic_timezone
+from tracing import start_trace, finish_trace, current_trace_id, current_traceparent, TraceIdFilter
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:[trace %(trace_id)s] %(message)s")
+for handler in logging.getLogger().handlers:
+    handler.addFilter(TraceIdFilter())
+logger = logging.getLogger(__name__)
+
+_first_response_logged = False
+
+
+async def _warm_up_upstream():
+    """Open the Cal.com connection in the background so it never delays startup."""
+    try:
+        await asyncio.to_thread(client.warm_up)
+    except requests.RequestException as e:
+        # The first request will simply reconnect
+        logger.warning(f"Cal.com warm-up failed: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up everything the first Vapi call would otherwise pay for."""
+    get_clinic_timezone()
+    try:
+        load_knowledge_base()
+    except FileNotFoundError:
+        logger.warning("knowledge_base.md not found - skipping preload")
+    background = [asyncio.create_task(_warm_up_upstream())]
+    if AVAILABILITY_EVENT_TYPE_IDS:
+        background.append(asyncio.create_task(
+            availability_index.refresh_forever(AVAILABILITY_EVENT_TYPE_IDS, AVAILABILITY_REFRESH_SECONDS)
+        ))
+    logger.info(f"Startup complete in {(time.perf_counter() - PROCESS_START) * 1000:.0f} ms")
+    yield
+    for task in background:
+        task.cancel()
+
 
 # Create FastAPI application
 app = FastAPI(
     title="Cal.com Integration API for Vapi",
     description="API service for handling Cal.com operations via Vapi custom tools. Each endpoint processes Vapi tool calls and returns formatted, minimal responses.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware - Allow all origins for Vapi compatibility
@@ -28,10 +80,52 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Wrap each request in a trace and echo its ID back to the caller."""
+    with start_trace(f"{request.method} {request.url.path}", request.headers.get("traceparent"), finish=False) as trace:
+        response = await call_next(request)
+        trace.root.set_attribute("http.status_code", response.status_code)
+        if response.status_code >= 500:
+            trace.root.status = "ERROR"
+        response.headers["traceparent"] = current_traceparent()
+    response.headers["X-Trace-Id"] = trace.trace_id
+    # Streaming routes keep calling Cal.com while the body is sent - close the trace only after that
+    response.body_iterator = _finish_trace_after(response.body_iterator, trace)
+    return response
+
+
+async def _finish_trace_after(body_iterator, trace):
+    """Pass the response body through, then finish the trace."""
+    global _first_response_logged
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+    finally:
+        if not _first_response_logged:
+            _first_response_logged = True
+            logger.info(
+                f"First response ({trace.root.name}) completed "
+                f"{(time.perf_counter() - PROCESS_START) * 1000:.0f} ms after process start"
+            )
+        finish_trace(trace)
+
+
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    """Same as FastAPI's default error body, plus the trace ID for support tickets."""
+    return JSONResponse(
+        {"detail": exc.detail, "trace_id": current_trace_id()},
+        status_code=exc.status_code,
+        headers=getattr(exc, "headers", None)
+    )
+
+
 # Include all routes
 app.include_router(router)
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
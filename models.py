@@ -1,8 +1,9 @@
 """
 Pydantic models for request validation.
 """
-from typing import Optional, Union
+from typing import Optional, Union, List
 from pydantic import BaseModel, Field, field_validator
+from config import BULK_LOOKUP_MAX_EMAILS
 from utils import to_int
 
 
@@ -29,6 +30,7 @@ class GetAvailableSlotsParams(BaseModel):
     username: Optional[str] = Field(None, description="Optional username filter")
     format: str = Field("time", description="'time' or 'range'")
     duration: Optional[int] = Field(None, description="Optional duration in minutes")
+    deadline_ms: Optional[int] = Field(None, gt=0, description="Give up on Cal.com after this many milliseconds")
     
     @field_validator('team_id', mode='before')
     @classmethod
@@ -47,6 +49,35 @@ class GetAvailableSlotsParams(BaseModel):
     def convert_duration(cls, v):
         """Convert string to int for duration (optional field)."""
         return to_int(v, 'duration')
+    
+    @field_validator('deadline_ms', mode='before')
+    @classmethod
+    def convert_deadline_ms(cls, v):
+        """Convert string to int for deadline_ms (optional field)."""
+        return to_int(v, 'deadline_ms')
+
+
+class GetAvailabilitySummaryParams(BaseModel):
+    """Parameters for getting per-day availability counts."""
+    team_id: int = Field(..., description="Team ID for the business")
+    event_type_id: int = Field(..., description="ID of the event type")
+    start_date: Optional[str] = Field(None, description="First day in ISO format (defaults to today)")
+    end_date: Optional[str] = Field(None, description="Last day in ISO format (defaults to start_date + 6 days)")
+    window: Optional[str] = Field(None, description="'morning', 'afternoon' or 'evening'")
+    start_time: Optional[str] = Field(None, description="Custom window start in clinic time, 'HH:MM'")
+    end_time: Optional[str] = Field(None, description="Custom window end in clinic time, 'HH:MM'")
+    
+    @field_validator('team_id', mode='before')
+    @classmethod
+    def convert_team_id(cls, v):
+        """Convert string to int for team_id."""
+        return to_int(v, 'team_id')
+    
+    @field_validator('event_type_id', mode='before')
+    @classmethod
+    def convert_event_type_id(cls, v):
+        """Convert string to int for event_type_id."""
+        return to_int(v, 'event_type_id')
 
 
 class GetUpcomingAppointmentsParams(BaseModel):
@@ -69,6 +100,55 @@ class GetUpcomingAppointmentsParams(BaseModel):
         return to_int(v, 'limit')
 
 
+class BulkGetUpcomingAppointmentsParams(BaseModel):
+    """Parameters for getting upcoming appointments for many patients at once."""
+    team_id: int = Field(..., description="Team ID for the business")
+    patient_emails: List[str] = Field(
+        ...,
+        description="Patients' emails to look up",
+        max_length=BULK_LOOKUP_MAX_EMAILS
+    )
+    after: Optional[str] = Field(None, description="Show only after this ISO date")
+    
+    @field_validator('team_id', mode='before')
+    @classmethod
+    def convert_team_id(cls, v):
+        """Convert string to int for team_id."""
+        return to_int(v, 'team_id')
+    
+    @field_validator('patient_emails')
+    @classmethod
+    def normalize_emails(cls, v):
+        """Strip, lowercase and deduplicate emails, keeping the original order."""
+        emails = list(dict.fromkeys(e.strip().lower() for e in v if e and e.strip()))
+        if not emails:
+            raise ValueError("patient_emails must contain at least one email")
+        return emails
+
+
+class ExportBookingsParams(BaseModel):
+    """Parameters for exporting a team's bookings over a date range."""
+    team_id: int = Field(..., description="Team ID for the business")
+    start_date: str = Field(..., description="Export bookings starting after this ISO date (e.g., '2026-02-01')")
+    end_date: str = Field(..., description="Export bookings ending before this ISO date (e.g., '2026-02-28')")
+    status: Optional[str] = Field(None, description="Optional Cal.com status filter (e.g., 'upcoming', 'past', 'cancelled')")
+    format: str = Field("ndjson", description="'ndjson' or 'csv'")
+    
+    @field_validator('team_id', mode='before')
+    @classmethod
+    def convert_team_id(cls, v):
+        """Convert string to int for team_id."""
+        return to_int(v, 'team_id')
+    
+    @field_validator('format')
+    @classmethod
+    def check_format(cls, v):
+        """Only NDJSON and CSV exports are supported."""
+        if v not in ("ndjson", "csv"):
+            raise ValueError("format must be 'ndjson' or 'csv'")
+        return v
+
+
 class CreateBookingParams(BaseModel):
     """Parameters for creating a booking."""
     team_id: int = Field(..., description="Team ID for the business")
@@ -0,0 +1,47 @@
+"""
+Import-time profiling report for cold starts.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and prints
+the slowest modules by cumulative import time.
+
+Usage: python profile_startup.py [top_n]
+"""
+import os
+import subprocess
+import sys
+
+
+def profile_imports(top_n: int = 20) -> None:
+    """Print the top_n slowest imports of the main module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        print(result.stderr, file=sys.stderr)
+        sys.exit(result.returncode)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        self_us, cumulative_us, module = int(parts[0]), int(parts[1]), parts[2].strip()
+        rows.append((cumulative_us, self_us, module))
+
+    total_us = next((r[0] for r in rows if r[2] == "main"), None)
+    if total_us is None:
+        print("No import timings found for main:", file=sys.stderr)
+        print(result.stderr, file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Total import time of main: {total_us / 1000:.1f} ms\n")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, module in sorted(rows, reverse=True)[:top_n]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {module}")
+
+
+if __name__ == "__main__":
+    profile_imports(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
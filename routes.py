@@ -1,31 +1,78 @@
 """
 FastAPI route handlers for all endpoints.
 """
+import asyncio
+import itertools
+import logging
+import time
+from datetime import date, datetime, timedelta
 from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 import requests
-from typing import Dict, Any, List
+from typing import Dict, Any, List, AsyncIterator, Iterator, Optional
 
 from models import (
     CancelAppointmentParams,
     GetAvailableSlotsParams,
+    GetAvailabilitySummaryParams,
     GetUpcomingAppointmentsParams,
+    BulkGetUpcomingAppointmentsParams,
+    ExportBookingsParams,
     CreateBookingParams,
     GetEventTypesParams
 )
-from utils import success_response, error_response
-from calcom_client import CalComClient
+from config import (
+    CLINIC_TIMEZONE,
+    BULK_LOOKUP_CONCURRENCY,
+    SLOTS_DEADLINE_MS,
+    SLOTS_HEDGING,
+    AVAILABILITY_REFRESH_SECONDS,
+)
+from utils import success_response, error_response, load_knowledge_base, get_clinic_timezone, ndjson_line, csv_line
+from calcom_client import CalComClient, DeadlineExceeded
 from auth import verify_token
+from availability import AvailabilityIndex, TIME_WINDOWS, window_mask
+from tracing import span
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 client = CalComClient()
+availability_index = AvailabilityIndex(client)
+
+EXPORT_CSV_COLUMNS = [
+    "id", "uid", "title", "start", "end", "status", "eventTypeId",
+    "attendee_names", "attendee_emails", "createdAt"
+]
+
+
+def _format_appointment(b: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a Cal.com booking to the fields we return to callers."""
+    return {
+        "id": b.get("id"),
+        "uid": b.get("uid"),
+        "title": b.get("title"),
+        "start": b.get("start"),
+        "end": b.get("end"),
+        "status": b.get("status"),
+        "eventTypeId": b.get("eventTypeId"),
+        "description": b.get("description"),
+        "attendees": [
+            {"name": a.get("name"), "email": a.get("email"), "timeZone": a.get("timeZone")}
+            for a in b.get("attendees", [])
+        ],
+        "createdAt": b.get("createdAt")
+    }
 
 
 @router.post("/cancel-appointment")
 async def cancel_appointment_endpoint(request: Request, authenticated: bool = Depends(verify_token)):
     """Cancel an appointment."""
     try:
-        payload = await request.json()
-        params = CancelAppointmentParams(**payload)
+        with span("parse_json"):
+            payload = await request.json()
+        with span("validate"):
+            params = CancelAppointmentParams(**payload)
 
         data = client.cancel_appointment(
             booking_id=params.booking_id,
@@ -56,26 +103,114 @@ async def cancel_appointment_endpoint(request: Request, authenticated: bool = De
 async def get_available_slots_endpoint(request: Request, authenticated: bool = Depends(verify_token)):
     """Get available slots for an event type."""
     try:
-        payload = await request.json()
-        params = GetAvailableSlotsParams(**payload)
-
-        data = client.get_available_slots(
-            event_type_id=params.event_type_id,
-            start_date=params.start_date,
-            end_date=params.end_date,
-            time_zone=params.time_zone,
-            username=params.username,
-            format=params.format,
-            duration=params.duration
-        )
+        with span("parse_json"):
+            payload = await request.json()
+        with span("validate"):
+            params = GetAvailableSlotsParams(**payload)
+        deadline_ms = params.deadline_ms or SLOTS_DEADLINE_MS
+
+        cached_at = None
+        try:
+            # Run off the event loop - the deadline/hedge wait would otherwise stall every other request
+            data = await asyncio.to_thread(
+                client.get_available_slots,
+                event_type_id=params.event_type_id,
+                start_date=params.start_date,
+                end_date=params.end_date,
+                time_zone=params.time_zone,
+                username=params.username,
+                format=params.format,
+                duration=params.duration,
+                deadline=deadline_ms / 1000,
+                hedge=SLOTS_HEDGING
+            )
+        except DeadlineExceeded as e:
+            if e.cached is None:
+                raise
+            # Out of time - fall back to the last good answer for the same query
+            data, fetched_at = e.cached
+            cached_at = datetime.fromtimestamp(fetched_at, get_clinic_timezone()).isoformat()
 
         if data.get("status") != "success":
             error_response("API returned non-success status")
 
         slots = data.get("data", {})
-        return success_response({
+        if cached_at is None and params.time_zone in (None, CLINIC_TIMEZONE) and not params.username and not params.duration:
+            # Fresh, unfiltered answer - keep the availability summary in sync. Only plain
+            # dates cover whole days; a query starting mid-day would wipe that day's earlier buckets.
+            try:
+                availability_index.update_from_slots(
+                    params.event_type_id,
+                    slots,
+                    date.fromisoformat(params.start_date),
+                    date.fromisoformat(params.end_date)
+                )
+            except ValueError:
+                pass
+
+        response = {
             "slots": slots,
-            "total_dates": len(slots)
+            "total_dates": len(slots),
+            "cached": cached_at is not None
+        }
+        if cached_at:
+            response["cached_at"] = cached_at
+        return success_response(response)
+
+    except DeadlineExceeded as e:
+        error_response(f"Request timed out: {str(e)}", 504)
+    except requests.RequestException as e:
+        error_response(f"Request failed: {str(e)}")
+    except ValueError as ve:
+        error_response(f"Invalid input: {str(ve)}", 422)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/get-availability-summary")
+async def get_availability_summary_endpoint(request: Request, authenticated: bool = Depends(verify_token)):
+    """Get the number of openings per day for an event type, from the precomputed index."""
+    try:
+        with span("parse_json"):
+            payload = await request.json()
+        with span("validate"):
+            params = GetAvailabilitySummaryParams(**payload)
+
+        today = datetime.now(get_clinic_timezone()).date()
+        start = date.fromisoformat(params.start_date[:10]) if params.start_date else today
+        end = date.fromisoformat(params.end_date[:10]) if params.end_date else start + timedelta(days=6)
+        if end < start:
+            raise ValueError("end_date must not be before start_date")
+
+        mask = None
+        if params.window:
+            if params.window not in TIME_WINDOWS:
+                raise ValueError(f"window must be one of {', '.join(TIME_WINDOWS)}")
+            mask = window_mask(*TIME_WINDOWS[params.window])
+        elif params.start_time or params.end_time:
+            if not (params.start_time and params.end_time):
+                raise ValueError("start_time and end_time must be given together")
+            mask = window_mask(params.start_time, params.end_time)
+
+        default_start, default_end = availability_index.default_range()
+        if default_start <= start and end <= default_end:
+            entry = availability_index.get(params.event_type_id)
+            # Background-refreshed entries are never this old unless refreshing keeps failing
+            if entry is None or not entry.covers(start, end) or time.time() - entry.built_at > 2 * AVAILABILITY_REFRESH_SECONDS:
+                entry = await asyncio.to_thread(availability_index.refresh, params.event_type_id)
+        else:
+            # Outside the indexed window - answer from a one-off build so the index entry stays intact
+            entry = await asyncio.to_thread(availability_index.fetch, params.event_type_id, start, end)
+
+        days = [
+            {"date": day.isoformat(), "day_of_week": day.strftime("%A"), "available_slots": openings}
+            for day, openings in entry.day_counts(start, end, mask)
+        ]
+        return success_response({
+            "event_type_id": params.event_type_id,
+            "days": days,
+            "days_with_openings": sum(1 for d in days if d["available_slots"]),
+            "updated_at": datetime.fromtimestamp(entry.built_at, get_clinic_timezone()).isoformat()
         })
 
     except requests.RequestException as e:
@@ -90,8 +225,10 @@ async def get_available_slots_endpoint(request: Request, authenticated: bool = D
 async def get_upcoming_appointments_endpoint(request: Request, authenticated: bool = Depends(verify_token)):
     """Get upcoming appointments for a patient."""
     try:
-        payload = await request.json()
-        params = GetUpcomingAppointmentsParams(**payload)
+        with span("parse_json"):
+            payload = await request.json()
+        with span("validate"):
+            params = GetUpcomingAppointmentsParams(**payload)
 
         data = client.get_upcoming_appointments(
             patient_email=params.patient_email,
@@ -103,23 +240,7 @@ async def get_upcoming_appointments_endpoint(request: Request, authenticated: bo
             error_response("API returned non-success status")
 
         bookings_raw = data.get("data", [])
-        appointments: List[Dict[str, Any]] = []
-        for b in bookings_raw:
-            appointments.append({
-                "id": b.get("id"),
-                "uid": b.get("uid"),
-                "title": b.get("title"),
-                "start": b.get("start"),
-                "end": b.get("end"),
-                "status": b.get("status"),
-                "eventTypeId": b.get("eventTypeId"),
-                "description": b.get("description"),
-                "attendees": [
-                    {"name": a.get("name"), "email": a.get("email"), "timeZone": a.get("timeZone")}
-                    for a in b.get("attendees", [])
-                ],
-                "createdAt": b.get("createdAt")
-            })
+        appointments: List[Dict[str, Any]] = [_format_appointment(b) for b in bookings_raw]
 
         return success_response({
             "appointments": appointments,
@@ -134,12 +255,143 @@ async def get_upcoming_appointments_endpoint(request: Request, authenticated: bo
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _stream_upcoming_appointments(emails: List[str], after: Optional[str]) -> AsyncIterator[str]:
+    """Look up each patient concurrently and yield one NDJSON line per patient as it resolves."""
+    semaphore = asyncio.Semaphore(BULK_LOOKUP_CONCURRENCY)
+
+    def fetch_all(email: str) -> List[Dict[str, Any]]:
+        return list(client.iter_bookings(status="upcoming", attendee_email=email, after_start=after))
+
+    async def lookup(email: str) -> Dict[str, Any]:
+        # Errors are reported per patient so one bad lookup never cuts off the stream
+        try:
+            async with semaphore:
+                bookings = await asyncio.to_thread(fetch_all, email)
+            appointments = [_format_appointment(b) for b in bookings]
+        except requests.RequestException as e:
+            return {"patient_email": email, "success": False, "error": f"Request failed: {str(e)}"}
+        except Exception as e:
+            return {"patient_email": email, "success": False, "error": str(e)}
+        return {
+            "patient_email": email,
+            "success": True,
+            "appointments": appointments,
+            "total_found": len(appointments)
+        }
+
+    tasks = [asyncio.create_task(lookup(email)) for email in emails]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield ndjson_line(await next_done)
+    finally:
+        # Client went away - drop lookups that haven't started yet
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/bulk-get-upcoming-appointments")
+async def bulk_get_upcoming_appointments_endpoint(request: Request, authenticated: bool = Depends(verify_token)):
+    """Get upcoming appointments for many patients, streamed back as NDJSON."""
+    try:
+        with span("parse_json"):
+            payload = await request.json()
+        with span("validate"):
+            params = BulkGetUpcomingAppointmentsParams(**payload)
+    except ValueError as ve:
+        error_response(f"Invalid input: {str(ve)}", 422)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(
+        _stream_upcoming_appointments(params.patient_emails, params.after),
+        media_type="application/x-ndjson"
+    )
+
+
+def _export_lines(bookings: Iterator[Dict[str, Any]], export_format: str) -> Iterator[str]:
+    """
+    Render bookings one line at a time as NDJSON or CSV.
+    
+    Headers are already sent by the time a later page fails, so the failure is
+    reported in-band as the last line: {"success": false, "error": ...} for
+    NDJSON, or a row whose id column is "ERROR" for CSV.
+    """
+    if export_format == "csv":
+        yield csv_line(EXPORT_CSV_COLUMNS)
+    try:
+        for b in bookings:
+            appointment = _format_appointment(b)
+            if export_format == "csv":
+                attendees = appointment["attendees"]
+                yield csv_line([
+                    appointment["id"], appointment["uid"], appointment["title"],
+                    appointment["start"], appointment["end"], appointment["status"],
+                    appointment["eventTypeId"],
+                    ";".join(a["name"] or "" for a in attendees),
+                    ";".join(a["email"] or "" for a in attendees),
+                    appointment["createdAt"]
+                ])
+            else:
+                yield ndjson_line(appointment)
+    except Exception as e:
+        if isinstance(e, requests.RequestException):
+            error = f"Export request failed: {str(e)}"
+            logger.warning(error)
+        else:
+            error = f"Export failed: {str(e)}"
+            logger.exception(error)
+        if export_format == "csv":
+            yield csv_line(["ERROR", error])
+        else:
+            yield ndjson_line({"success": False, "error": error})
+
+
+@router.post("/export-bookings")
+async def export_bookings_endpoint(request: Request, authenticated: bool = Depends(verify_token)):
+    """Export all of a team's bookings in a date range, streamed as NDJSON or CSV."""
+    try:
+        with span("parse_json"):
+            payload = await request.json()
+        with span("validate"):
+            params = ExportBookingsParams(**payload)
+
+        bookings = client.iter_bookings(
+            team_id=params.team_id,
+            after_start=params.start_date,
+            before_end=params.end_date,
+            status=params.status,
+            prefetch=True
+        )
+        # Pull the first page before streaming so upstream errors still get a proper status code
+        first = await asyncio.to_thread(next, bookings, None)
+        if first is not None:
+            bookings = itertools.chain([first], bookings)
+
+    except requests.RequestException as e:
+        error_response(f"Export request failed: {str(e)}")
+    except ValueError as ve:
+        error_response(f"Invalid input: {str(ve)}", 422)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if params.format == "csv":
+        filename = f"bookings-{params.team_id}-{params.start_date}-{params.end_date}.csv"
+        return StreamingResponse(
+            _export_lines(bookings, "csv"),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    return StreamingResponse(_export_lines(bookings, "ndjson"), media_type="application/x-ndjson")
+
+
 @router.post("/create-booking")
 async def create_booking_endpoint(request: Request, authenticated: bool = Depends(verify_token)):
     """Create a new booking."""
     try:
-        payload = await request.json()
-        params = CreateBookingParams(**payload)
+        with span("parse_json"):
+            payload = await request.json()
+        with span("validate"):
+            params = CreateBookingParams(**payload)
 
         data = client.create_booking(
             event_type_id=params.event_type_id,
@@ -181,8 +433,10 @@ async def create_booking_endpoint(request: Request, authenticated: bool = Depend
 async def get_event_types_endpoint(request: Request, authenticated: bool = Depends(verify_token)):
     """Get event types for a team."""
     try:
-        payload = await request.json()
-        params = GetEventTypesParams(**payload)
+        with span("parse_json"):
+            payload = await request.json()
+        with span("validate"):
+            params = GetEventTypesParams(**payload)
 
         # Use team_id from request parameters
         data = client.get_event_types(team_id=params.team_id)
@@ -220,21 +474,15 @@ async def get_event_types_endpoint(request: Request, authenticated: bool = Depen
 @router.post("/query-knowledge-base")
 async def query_knowledge_base_endpoint(request: Request, authenticated: bool = Depends(verify_token)):
     """Query the knowledge base - returns content from knowledge_base.md file."""
-    import os
-    
     try:
-        # Read the knowledge base markdown file
-        kb_file_path = os.path.join(os.path.dirname(__file__), "knowledge_base.md")
-        
-        if not os.path.exists(kb_file_path):
+        try:
+            knowledge_content = load_knowledge_base()
+        except FileNotFoundError:
             error_response(
                 "Knowledge base file not found. Please create 'knowledge_base.md' in the project directory.",
                 404
             )
         
-        with open(kb_file_path, "r", encoding="utf-8") as f:
-            knowledge_content = f.read()
-        
         return success_response({
             "content": knowledge_content,
             "source": "knowledge_base.md"
@@ -247,14 +495,9 @@ async def query_knowledge_base_endpoint(request: Request, authenticated: bool =
 @router.get("/clinic-info")
 async def get_clinic_info(authenticated: bool = Depends(verify_token)):
     """Get current clinic information including date, time, and timezone."""
-    from datetime import datetime
-    from config import CLINIC_TIMEZONE
-    import pytz
-    
     try:
         # Get current time in clinic timezone
-        clinic_tz = pytz.timezone(CLINIC_TIMEZONE)
-        current_time = datetime.now(clinic_tz)
+        current_time = datetime.now(get_clinic_timezone())
         
         return success_response({
             "current_datetime": current_time.strftime("%Y-%m-%d %H:%M:%S"),
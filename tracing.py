@@ -0,0 +1,230 @@
+"""
+Lightweight request tracing with OpenTelemetry-compatible output.
+
+Every request gets a W3C trace ID and a tree of spans (handler phases and
+Cal.com HTTP calls). Spans are always collected in memory, which is cheap;
+head-based sampling decides which traces are exported as OTLP/JSON lines to
+TRACE_EXPORT_PATH, and any request slower than SLOW_REQUEST_MS is logged with
+its full span tree regardless of sampling.
+"""
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Iterator
+
+from config import TRACE_SAMPLE_RATE, TRACE_EXPORT_PATH, SLOW_REQUEST_MS
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "calcom-integration-api"
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.status = "ERROR"
+        self.attributes["exception.type"] = type(exc).__name__
+        self.attributes["exception.message"] = str(exc)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Serialize in the OTLP/JSON span shape."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": k, "value": {"stringValue": str(v)}} for k, v in self.attributes.items()],
+            "status": {"code": 2 if self.status == "ERROR" else 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class Trace:
+    """All spans recorded for one request."""
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            # Work that outlives the request (e.g. an abandoned hedged call) is dropped
+            if not self.finished:
+                self.spans.append(span)
+
+    def format_tree(self) -> str:
+        """Render the spans as an indented tree, one line per span."""
+        children: Dict[Optional[str], List[Span]] = {}
+        for span in self.spans:
+            children.setdefault(span.parent_id, []).append(span)
+
+        lines = []
+
+        def render(span: Span, depth: int) -> None:
+            attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+            status = " ERROR" if span.status == "ERROR" else ""
+            lines.append(f"{'  ' * depth}{span.name} {span.duration_ms:.1f} ms{status} {attributes}".rstrip())
+            for child in sorted(children.get(span.span_id, []), key=lambda s: s.start_ns):
+                render(child, depth + 1)
+
+        span_ids = {span.span_id for span in self.spans}
+        for root in (s for s in self.spans if s.parent_id not in span_ids):
+            render(root, 0)
+        return "\n".join(lines)
+
+
+def _parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """Return (trace_id, parent_span_id, sampled) from a W3C traceparent header."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def current_traceparent() -> Optional[str]:
+    """Return a W3C traceparent header for the current span."""
+    trace, current = _current_trace.get(), _current_span.get()
+    if trace is None or current is None:
+        return None
+    return f"00-{trace.trace_id}-{current.span_id}-{'01' if trace.sampled else '00'}"
+
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, finish: bool = True) -> Iterator[Trace]:
+    """
+    Start a trace (continuing an incoming traceparent if given) with a root span.
+    
+    With finish=False the trace stays open after the block exits (unless it
+    raised) and the caller must call finish_trace(), e.g. once a streamed
+    response body has been sent.
+    """
+    incoming = _parse_traceparent(traceparent)
+    if incoming:
+        trace_id, parent_id, sampled = incoming
+    else:
+        trace_id, parent_id, sampled = secrets.token_hex(16), None, random.random() < TRACE_SAMPLE_RATE
+
+    trace = Trace(trace_id, sampled)
+    root = Span(name, trace_id, parent_id, {})
+    trace.root = root
+    trace.add(root)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(root)
+    try:
+        yield trace
+    except BaseException as e:
+        root.record_exception(e)
+        finish = True
+        raise
+    finally:
+        try:
+            if finish:
+                finish_trace(trace)
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Record a child span of the current span; a no-op outside a trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    current = Span(name, trace.trace_id, parent.span_id if parent else None, attributes)
+    trace.add(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+def finish_trace(trace: Trace) -> None:
+    """End the root span, export a sampled trace and log it if the request was slow."""
+    with trace._lock:
+        if trace.finished:
+            return
+        trace.finished = True
+    root = trace.root
+    root.end_ns = time.time_ns()
+
+    if root.duration_ms >= SLOW_REQUEST_MS:
+        logger.warning(
+            # Runs after the response body is sent, outside the request context - name the trace explicitly
+            f"Slow request {root.name} took {root.duration_ms:.0f} ms (trace {trace.trace_id}):\n"
+            f"{trace.format_tree()}"
+        )
+
+    if trace.sampled and TRACE_EXPORT_PATH:
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": [s.to_otlp() for s in trace.spans]}],
+            }]
+        })
+        try:
+            with _export_lock, open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"Trace export failed: {str(e)}")
+
+
+class TraceIdFilter(logging.Filter):
+    """Attach the current trace ID to log records as %(trace_id)s."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
@@ -1,9 +1,23 @@
 """
 Helper utilities for the Cal.com Integration API.
 """
-from typing import Dict, Any, Union, Optional
+import csv
+import io
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Any, Union, Optional, Iterable
+
+import pytz
 from fastapi import HTTPException
 
+from config import CLINIC_TIMEZONE
+
+KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(__file__), "knowledge_base.md")
+
+# (mtime, content) of the last knowledge base read
+_knowledge_base_cache: Optional[tuple] = None
+
 
 def success_response(data: Dict[str, Any]) -> Dict[str, Any]:
     """Return successful response."""
@@ -15,6 +29,18 @@ def error_response(error_msg: str, status_code: int = 400):
     raise HTTPException(status_code=status_code, detail=error_msg)
 
 
+def ndjson_line(data: Dict[str, Any]) -> str:
+    """Serialize one record as a newline-delimited JSON line."""
+    return json.dumps(data, default=str) + "\n"
+
+
+def csv_line(values: Iterable[Any]) -> str:
+    """Serialize one row as a CSV line."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(values)
+    return buffer.getvalue()
+
+
 def to_int(value: Union[int, str, None], field_name: str = "field") -> Optional[int]:
     """
     Convert a value to integer, accepting both int and str inputs.
@@ -40,3 +66,27 @@ def to_int(value: Union[int, str, None], field_name: str = "field") -> Optional[
             return int(value)
         except ValueError:
             raise ValueError(f"{field_name} must be a valid integer, got '{value}'")
+
+
+def load_knowledge_base() -> str:
+    """
+    Return the contents of knowledge_base.md, cached in memory.
+    
+    The file is re-read only when its modification time changes, so edits are
+    still picked up without a restart.
+    
+    Raises:
+        FileNotFoundError: If the knowledge base file does not exist
+    """
+    global _knowledge_base_cache
+    mtime = os.stat(KNOWLEDGE_BASE_PATH).st_mtime
+    if _knowledge_base_cache is None or _knowledge_base_cache[0] != mtime:
+        with open(KNOWLEDGE_BASE_PATH, "r", encoding="utf-8") as f:
+            _knowledge_base_cache = (mtime, f.read())
+    return _knowledge_base_cache[1]
+
+
+@lru_cache(maxsize=None)
+def get_clinic_timezone() -> pytz.BaseTzInfo:
+    """Return the clinic timezone object (loaded from tz data once)."""
+    return pytz.timezone(CLINIC_TIMEZONE)